@@ -0,0 +1,185 @@
+"""
+Middleware ASGI puro de CORS + instrumentação
+
+Substitui o CORSMiddleware do Starlette e o antigo @app.middleware("http")
+(BaseHTTPMiddleware), que criava um Request/Response por requisição e
+imprimia duas linhas de log em cada chamada. Aqui tudo acontece no nível
+das mensagens ASGI:
+
+- OPTIONS (preflight) é respondido direto, sem passar pelo app, mas com
+  request_id, em_andamento e observadores como qualquer outra requisição
+- Os headers CORS são tuplas de bytes pré-computadas, anexadas ao
+  http.response.start (substituindo qualquer header CORS vindo do app)
+- Exceções antes do início da resposta viram 500 text/plain com CORS
+- Observadores opcionais recebem (método, rota, status, duração, bytes)
+  ao fim de cada requisição; sem observadores, nada é medido além do relógio.
+  A rota é o template do path ("/api/students/{aluno_id}"), não a URL, para
+  manter a cardinalidade das métricas limitada
+- em_andamento opcional (objeto com inc()/dec()) acompanha as requisições abertas
+- Cada requisição ganha um request_id (X-Request-ID recebido ou gerado),
+  exposto no header de resposta e em todas as linhas de log
+
+Política: allow_origins com "*" (padrão) responde Access-Control-Allow-Origin
+"*"; sem "*", ecoa o Origin recebido só se estiver na lista (com Vary: Origin).
+Credentials sempre "false".
+"""
+
+import logging
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from structured_logging import encerrar_contexto_requisicao, iniciar_contexto_requisicao
+
+Header = Tuple[bytes, bytes]
+Observador = Callable[[str, str, int, float, int], None]
+
+logger = logging.getLogger("asgi")
+
+def headers_cors(
+    allow_origin: str = "*",
+    allow_methods: str = "*",
+    allow_headers: str = "*",
+    expose_headers: str = "*",
+    max_age: int = 86400,
+) -> List[Header]:
+    """Headers CORS já codificados (calculados uma vez na criação do middleware)"""
+    return [
+        (b"access-control-allow-origin", allow_origin.encode("latin-1")),
+        (b"access-control-allow-methods", allow_methods.encode("latin-1")),
+        (b"access-control-allow-headers", allow_headers.encode("latin-1")),
+        (b"access-control-allow-credentials", b"false"),  # False quando origin é *
+        (b"access-control-max-age", str(max_age).encode("latin-1")),
+        (b"access-control-expose-headers", expose_headers.encode("latin-1")),
+    ]
+
+class CORSInstrumentacaoMiddleware:
+    """CORS + medição de requisições como um único middleware ASGI"""
+
+    def __init__(
+        self,
+        app,
+        observadores: Optional[Iterable[Observador]] = None,
+        em_andamento=None,
+        allow_origins: Iterable[str] = ("*",),
+        **opcoes_cors,
+    ):
+        self.app = app
+        self.observadores: List[Observador] = list(observadores or [])
+        self.em_andamento = em_andamento
+        self.origens = frozenset(allow_origins)
+        self.qualquer_origem = "*" in self.origens
+        self.headers_cors = headers_cors(**opcoes_cors)
+        self.nomes_cors = frozenset(nome for nome, _ in self.headers_cors)
+        if not self.qualquer_origem:
+            # Allow-Origin passa a depender da requisição (ver headers_cors_para)
+            self.headers_cors = [h for h in self.headers_cors if h[0] != b"access-control-allow-origin"]
+            self.headers_cors.append((b"vary", b"Origin"))
+
+        corpo_preflight = b"OK"
+        self.headers_preflight = [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(corpo_preflight)).encode("latin-1")),
+        ]
+        self.preflight_body = {"type": "http.response.body", "body": corpo_preflight}
+
+    def headers_cors_para(self, origem: Optional[bytes]) -> List[Header]:
+        if self.qualquer_origem:
+            return self.headers_cors
+        if origem is not None and origem.decode("latin-1") in self.origens:
+            return self.headers_cors + [(b"access-control-allow-origin", origem)]
+        return self.headers_cors
+
+    def adicionar_observador(self, observador: Observador):
+        self.observadores.append(observador)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        estado = {"status": 500, "bytes": 0, "iniciada": False}
+
+        request_id_recebido = None
+        origem = None
+        for nome, valor in scope.get("headers", ()):
+            if nome == b"x-request-id":
+                request_id_recebido = valor.decode("latin-1")[:64]
+            elif nome == b"origin":
+                origem = valor
+        request_id, tokens = iniciar_contexto_requisicao(request_id_recebido)
+        header_request_id = (b"x-request-id", request_id.encode("latin-1"))
+        em_andamento = self.em_andamento
+        if em_andamento is not None:
+            em_andamento.inc()
+
+        headers_cors = self.headers_cors_para(origem)
+        nomes_cors = self.nomes_cors
+        medir_bytes = bool(self.observadores)
+
+        async def send_com_cors(mensagem):
+            tipo = mensagem["type"]
+            if tipo == "http.response.start":
+                estado["iniciada"] = True
+                estado["status"] = mensagem["status"]
+                # 🛡️ Força headers CORS em TODAS as respostas
+                headers = [h for h in mensagem.get("headers", ()) if h[0].lower() not in nomes_cors]
+                headers.extend(headers_cors)
+                headers.append(header_request_id)
+                mensagem = {**mensagem, "headers": headers}
+            elif medir_bytes and tipo == "http.response.body":
+                estado["bytes"] += len(mensagem.get("body", b""))
+            await send(mensagem)
+
+        try:
+            if scope["method"] == "OPTIONS":
+                # 🚨 PREFLIGHT - Resposta direta, sem passar pelo app
+                estado["iniciada"] = True
+                await send({
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": headers_cors + [header_request_id] + self.headers_preflight,
+                })
+                await send(self.preflight_body)
+                estado["status"] = 200
+                estado["bytes"] = len(self.preflight_body["body"])
+            else:
+                await self.app(scope, receive, send_com_cors)
+        except Exception as e:
+            if estado["iniciada"]:
+                raise
+            # 🚨 ERRO: Ainda retorna resposta com CORS
+            logger.exception("❌ Erro no middleware: %s %s", scope["method"], scope["path"])
+            corpo = f"Server Error: {e}".encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 500,
+                "headers": headers_cors + [
+                    header_request_id,
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(corpo)).encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": corpo})
+            estado["status"] = 500
+            estado["bytes"] = len(corpo)
+        finally:
+            if em_andamento is not None:
+                em_andamento.dec()
+            self._notificar(scope, estado, inicio)
+            encerrar_contexto_requisicao(tokens)
+
+    def _notificar(self, scope, estado: dict, inicio: float):
+        if not self.observadores:
+            return
+        duracao = time.perf_counter() - inicio
+        if scope["method"] == "OPTIONS":
+            rota = "<preflight>"
+        else:
+            # O router do Starlette/FastAPI grava a rota encontrada no próprio scope
+            rota = getattr(scope.get("route"), "path", None) or "<sem_rota>"
+        for observador in self.observadores:
+            try:
+                observador(scope["method"], rota, estado["status"], duracao, estado["bytes"])
+            except Exception:
+                logger.exception("⚠️ Observador do middleware falhou")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark da pilha de middlewares em /api/ping
+
+Compara, num app mínimo com a mesma rota /api/ping (sem MongoDB):
+    legado  -> 2x CORSMiddleware + @app.middleware("http") com prints
+    asgi    -> CORSInstrumentacaoMiddleware (asgi_middleware.py)
+
+As requisições passam pelo httpx.ASGITransport, sem rede nem servidor.
+
+Uso:
+    python bench_middleware.py                   # 5000 requisições, 50 concorrentes
+    python bench_middleware.py -n 20000 -c 100
+    python bench_middleware.py --preflight       # mede OPTIONS em vez de GET
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+from datetime import datetime
+
+from fastapi import APIRouter, FastAPI, Response
+from starlette.middleware.cors import CORSMiddleware
+
+from asgi_middleware import CORSInstrumentacaoMiddleware
+
+def criar_app() -> FastAPI:
+    app = FastAPI()
+    router = APIRouter(prefix="/api")
+
+    @router.get("/ping")
+    async def ping():
+        return {"message": "Backend funcionando!", "timestamp": datetime.now().isoformat()}
+
+    app.include_router(router)
+    return app
+
+def app_legado() -> FastAPI:
+    """Reprodução da pilha anterior (dois CORSMiddleware + BaseHTTPMiddleware)"""
+    app = criar_app()
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["*"],
+    )
+
+    @app.middleware("http")
+    async def cors_handler(request, call_next):
+        cors_headers = {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "*",
+            "Access-Control-Allow-Headers": "*",
+            "Access-Control-Allow-Credentials": "false",
+            "Access-Control-Max-Age": "86400",
+            "Access-Control-Expose-Headers": "*"
+        }
+        if request.method == "OPTIONS":
+            print(f"🔧 Handling PREFLIGHT for: {request.url}")
+            response = Response(status_code=200, content="OK")
+            for key, value in cors_headers.items():
+                response.headers[key] = value
+            return response
+        print(f"🔍 Processing {request.method} {request.url}")
+        response = await call_next(request)
+        for key, value in cors_headers.items():
+            response.headers[key] = value
+        print(f"✅ CORS headers added to response: {response.status_code}")
+        return response
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["*"],
+    )
+    return app
+
+def app_asgi() -> FastAPI:
+    app = criar_app()
+    app.add_middleware(CORSInstrumentacaoMiddleware)
+    return app
+
+async def medir(httpx, app, total: int, concorrencia: int, preflight: bool) -> dict:
+    transporte = httpx.ASGITransport(app=app)
+    headers = {"Origin": "https://front-end-sistema.vercel.app"}
+    if preflight:
+        headers["Access-Control-Request-Method"] = "GET"
+    latencias = []
+
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        async def requisitar():
+            inicio = time.perf_counter()
+            if preflight:
+                resposta = await cliente.options("/api/ping", headers=headers)
+            else:
+                resposta = await cliente.get("/api/ping", headers=headers)
+            latencias.append(time.perf_counter() - inicio)
+            assert resposta.status_code == 200, resposta.status_code
+            assert "access-control-allow-origin" in resposta.headers
+
+        async def trabalhador(quantidade: int):
+            for _ in range(quantidade):
+                await requisitar()
+
+        # Os prints do app legado fazem parte do custo medido, mas não poluem a saída
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(min(200, total)):  # Aquecimento
+                await requisitar()
+            latencias.clear()
+
+            base, resto = divmod(total, concorrencia)
+            inicio = time.perf_counter()
+            await asyncio.gather(*(trabalhador(base + (1 if i < resto else 0)) for i in range(concorrencia)))
+            duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "rps": total / duracao,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p99_ms": latencias[int(len(latencias) * 0.99) - 1] * 1000,
+    }
+
+async def main(total: int, concorrencia: int, preflight: bool):
+    try:
+        import httpx
+    except ImportError:
+        print("❌ httpx não instalado: pip install httpx")
+        return
+
+    metodo = "OPTIONS" if preflight else "GET"
+    print(f"📊 {metodo} /api/ping - {total} requisições, {concorrencia} concorrentes")
+    resultados = {}
+    for nome, fabrica in (("legado", app_legado), ("asgi", app_asgi)):
+        resultados[nome] = await medir(httpx, fabrica(), total, concorrencia, preflight)
+        r = resultados[nome]
+        print(f"   {nome:<7} {r['rps']:>9.0f} req/s   p50 {r['p50_ms']:.3f} ms   p99 {r['p99_ms']:.3f} ms")
+
+    ganho = resultados["asgi"]["rps"] / resultados["legado"]["rps"]
+    print(f"⚡ Vazão: {ganho:.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dos middlewares CORS em /api/ping")
+    parser.add_argument("-n", "--requisicoes", type=int, default=5000)
+    parser.add_argument("-c", "--concorrencia", type=int, default=50)
+    parser.add_argument("--preflight", action="store_true", help="Medir OPTIONS (preflight)")
+    args = parser.parse_args()
+    asyncio.run(main(args.requisicoes, args.concorrencia, args.preflight))
@@ -0,0 +1,227 @@
+"""
+Filtros e pipelines de consulta dos caminhos quentes
+
+Funções puras (sem acesso ao banco) que montam os filtros de find() e os
+pipelines de aggregate() usados pelo server.py. Ficam fora do server.py para
+que tests/test_query_plans.py rode explain() nas mesmas consultas que a API
+executa, sem importar o app.
+"""
+
+import base64
+import json
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+BITS_POR_PALAVRA = 32  # Bitset de presença das chamadas no formato compacto
+
+RISCO_LIMITE_NORMAL = 75
+RISCO_LIMITE_ATENCAO = 50
+RISCO_ROTULOS = {
+    "normal": "Situação Normal",
+    "atencao": "Atenção",
+    "critico": "Situação Crítica"
+}
+
+# Alunos em risco: do menor percentual para o maior (índice turma_id+risco+percentual+aluno_id)
+ORDENACAO_ALUNOS_EM_RISCO: List[Tuple[str, int]] = [("percentual", 1), ("aluno_id", 1)]
+
+# -------------------------
+# Filtros
+# -------------------------
+
+def filtro_periodo(data_inicio: Optional[str] = None, data_fim: Optional[str] = None) -> Optional[dict]:
+    """Intervalo de datas ISO ($gte/$lte); None se nenhum limite foi informado"""
+    periodo = {}
+    if data_inicio:
+        periodo["$gte"] = data_inicio
+    if data_fim:
+        periodo["$lte"] = data_fim
+    return periodo or None
+
+def filtro_turmas_periodo(
+    turma_ids: Optional[List[str]],
+    data_inicio: Optional[str] = None,
+    data_fim: Optional[str] = None
+) -> dict:
+    """turma_id $in + data no período (turma_ids=None: todas as turmas)"""
+    filtro = {}
+    if turma_ids is not None:
+        filtro["turma_id"] = {"$in": turma_ids}
+    periodo = filtro_periodo(data_inicio, data_fim)
+    if periodo:
+        filtro["data"] = periodo
+    return filtro
+
+def filtro_turmas_datas(turma_ids: Iterable[str], datas: Iterable[str]) -> dict:
+    """Chamadas de um conjunto de turmas em datas específicas (pendências)"""
+    return {"turma_id": {"$in": list(turma_ids)}, "data": {"$in": list(datas)}}
+
+# -------------------------
+# Pipelines
+# -------------------------
+
+def pipeline_soma_frequencia_diaria(match: dict) -> List[dict]:
+    """Totais de chamadas/presentes/ausentes dos rollups diários"""
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": None,
+            "chamadas": {"$sum": "$chamadas"},
+            "presentes": {"$sum": "$presentes"},
+            "ausentes": {"$sum": "$ausentes"}
+        }}
+    ]
+
+def pipeline_tendencia_diaria(match: dict) -> List[dict]:
+    """Um documento por dia (todas as turmas do filtro somadas), em ordem de data"""
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": "$data",
+            "chamadas": {"$sum": "$chamadas"},
+            "presentes": {"$sum": "$presentes"},
+            "ausentes": {"$sum": "$ausentes"}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+
+def estagio_registros_chamada() -> dict:
+    """Estágio $project que normaliza os três formatos de chamada em
+    '_registros': [{aluno_id, presente}] (equivalente a iter_registros_chamada)"""
+    # Bit i do bitset: floor(palavra / 2^(i % 32)) % 2, com palavra = presenca_bits[i // 32]
+    bit_presenca = {"$mod": [
+        {"$floor": {"$divide": [
+            {"$arrayElemAt": ["$presenca_bits", {"$floor": {"$divide": ["$$i", BITS_POR_PALAVRA]}}]},
+            {"$pow": [2, {"$mod": ["$$i", BITS_POR_PALAVRA]}]}
+        ]}},
+        2
+    ]}
+    return {"$project": {
+        "turma_id": 1,
+        "data": 1,
+        "_registros": {"$cond": [
+            {"$isArray": "$presenca_bits"},
+            {"$map": {
+                "input": {"$range": [0, {"$size": "$alunos_ids"}]},
+                "as": "i",
+                "in": {"aluno_id": {"$arrayElemAt": ["$alunos_ids", "$$i"]}, "presente": {"$eq": [bit_presenca, 1]}}
+            }},
+            {"$cond": [
+                {"$gt": [{"$size": {"$ifNull": ["$records", []]}}, 0]},
+                {"$map": {
+                    "input": "$records",
+                    "as": "r",
+                    "in": {"aluno_id": "$$r.aluno_id", "presente": {"$eq": ["$$r.presente", True]}}
+                }},
+                {"$map": {
+                    "input": {"$objectToArray": {"$ifNull": ["$presencas", {}]}},
+                    "as": "p",
+                    "in": {"aluno_id": "$$p.k", "presente": {"$eq": ["$$p.v.presente", True]}}
+                }}
+            ]}
+        ]}
+    }}
+
+def estagios_relatorio_frequencia() -> List[dict]:
+    """Estágios finais do relatório por aluno: dados do aluno via $lookup,
+    percentual e classificação de risco calculados no próprio MongoDB"""
+    return [
+        {"$lookup": {"from": "alunos", "localField": "_id", "foreignField": "id", "as": "aluno"}},
+        {"$unwind": "$aluno"},  # Alunos inexistentes ficam de fora (como antes)
+        {"$addFields": {"percentual": {"$cond": [
+            {"$gt": ["$total_chamadas", 0]},
+            {"$round": [{"$multiply": [{"$divide": ["$total_presencas", "$total_chamadas"]}, 100]}, 2]},
+            0.0
+        ]}}},
+        {"$addFields": {"risco": {"$switch": {
+            "branches": [
+                {"case": {"$gte": ["$percentual", RISCO_LIMITE_NORMAL]}, "then": RISCO_ROTULOS["normal"]},
+                {"case": {"$gte": ["$percentual", RISCO_LIMITE_ATENCAO]}, "then": RISCO_ROTULOS["atencao"]}
+            ],
+            "default": RISCO_ROTULOS["critico"]
+        }}}},
+        {"$project": {
+            "_id": 0,
+            "aluno_id": "$_id",
+            "turma_id": 1,
+            "nome": {"$ifNull": ["$aluno.nome", ""]},
+            "cpf": "$aluno.cpf",
+            "status": "$aluno.status",
+            "data_nascimento": "$aluno.data_nascimento",
+            "email": "$aluno.email",
+            "total_chamadas": 1,
+            "total_presencas": 1,
+            "total_faltas": 1,
+            "percentual": 1,
+            "risco": 1
+        }}
+    ]
+
+def pipeline_frequencia_chamadas(query: dict, estagios_finais: Optional[List[dict]] = None) -> List[dict]:
+    """Relatório por aluno a partir das attendances ($unwind dos registros + $group)"""
+    return [
+        {"$match": query},
+        estagio_registros_chamada(),
+        {"$unwind": "$_registros"},
+        {"$match": {"_registros.aluno_id": {"$nin": [None, ""]}}},
+        {"$group": {
+            "_id": "$_registros.aluno_id",
+            "total_chamadas": {"$sum": 1},
+            "total_presencas": {"$sum": {"$cond": ["$_registros.presente", 1, 0]}},
+            "turma_id": {"$first": "$turma_id"}
+        }},
+        {"$addFields": {"total_faltas": {"$subtract": ["$total_chamadas", "$total_presencas"]}}},
+    ] + estagios_relatorio_frequencia() + (estagios_finais or [{"$sort": {"nome": 1}}])
+
+def pipeline_frequencia_agregados(match: dict, estagios_finais: Optional[List[dict]] = None) -> List[dict]:
+    """Relatório por aluno a partir de 'frequencia_alunos' (sem filtro de data)"""
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": "$aluno_id",
+            "total_chamadas": {"$sum": "$total_chamadas"},
+            "total_presencas": {"$sum": "$presencas"},
+            "total_faltas": {"$sum": "$faltas"},
+            "turma_id": {"$first": "$turma_id"}
+        }},
+    ] + estagios_relatorio_frequencia() + (estagios_finais or [{"$sort": {"nome": 1}}])
+
+# Campos de ordenação aceitos pelo relatório por aluno (parâmetro -> campo do pipeline)
+CAMPOS_ORDENACAO_FREQUENCIA = {
+    "nome": "nome",
+    "percentual": "percentual",
+    "faltas": "total_faltas"
+}
+
+def codificar_cursor_frequencia(valor, aluno_id: str) -> str:
+    """Cursor opaco (keyset) = último (valor de ordenação, aluno_id) da página"""
+    return base64.urlsafe_b64encode(json.dumps([valor, aluno_id]).encode()).decode()
+
+def decodificar_cursor_frequencia(cursor: str) -> tuple:
+    try:
+        valor, aluno_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return valor, aluno_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+
+def estagios_pagina_frequencia(
+    ordenar_por: str,
+    ordem: str,
+    cursor: Optional[str],
+    limit: int
+) -> List[dict]:
+    """$sort estável (campo, aluno_id) + $match de keyset + $limit (limit+1 detecta próxima página)"""
+    campo = CAMPOS_ORDENACAO_FREQUENCIA[ordenar_por]
+    direcao = 1 if ordem == "asc" else -1
+    estagios = []
+    if cursor:
+        valor, aluno_id = decodificar_cursor_frequencia(cursor)
+        operador = "$gt" if direcao == 1 else "$lt"
+        estagios.append({"$match": {"$or": [
+            {campo: {operador: valor}},
+            {campo: valor, "aluno_id": {operador: aluno_id}}
+        ]}})
+    estagios.append({"$sort": {campo: direcao, "aluno_id": direcao}})
+    estagios.append({"$limit": limit + 1})
+    return estagios
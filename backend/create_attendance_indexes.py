@@ -2,6 +2,9 @@
 """
 Script para criar índices únicos necessários para o sistema de attendance
 Execute este script UMA VEZ após fazer deploy do backend
+
+Obs.: o backend agora reconcilia todos os índices no startup a partir do
+registro em db_indexes.py (python db_indexes.py --dry-run para conferir).
 """
 
 import asyncio
@@ -45,8 +48,8 @@ async def create_attendance_indexes():
         print(f"✅ Índice turma_id criado: {result2}")
         
         # 3) Índice para consultas rápidas nas turmas por instrutor
-        print("📋 Criando índice instrutor_id em classes...")
-        result3 = await db.classes.create_index([("instrutor_id", 1)])
+        print("📋 Criando índice instrutor_id em turmas...")
+        result3 = await db.turmas.create_index([("instrutor_id", 1)])
         print(f"✅ Índice instrutor_id criado: {result3}")
         
         # 4) Verificar se os índices foram criados
@@ -58,10 +61,10 @@ async def create_attendance_indexes():
         for idx in attendance_indexes:
             print(f"   - {idx['name']}: {idx.get('key', 'N/A')}")
         
-        # Listar índices da collection classes  
-        classes_indexes = await db.classes.list_indexes().to_list(None)
-        print("\n🔍 Índices em classes:")
-        for idx in classes_indexes:
+        # Listar índices da collection turmas
+        turmas_indexes = await db.turmas.list_indexes().to_list(None)
+        print("\n🔍 Índices em turmas:")
+        for idx in turmas_indexes:
             print(f"   - {idx['name']}: {idx.get('key', 'N/A')}")
         
         print("\n🎉 Todos os índices foram criados com sucesso!")
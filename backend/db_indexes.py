@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Registro declarativo dos índices do MongoDB
+
+Cada consulta feita pela API deve ter um índice declarado aqui.
+O startup_event reconcilia o registro com o banco (cria os que faltam e
+reporta divergentes/extras, sem remover nada). Também funciona como CLI:
+
+Uso:
+    python db_indexes.py                  # reconcilia (cria os índices faltantes)
+    python db_indexes.py --dry-run        # apenas reporta o que seria feito
+    python db_indexes.py --drop-extras    # reconcilia e remove índices não declarados
+"""
+
+import argparse
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+# Tempo de vida das Idempotency-Keys (índice TTL em idempotency_keys.created_at)
+IDEMPOTENCY_TTL_HORAS = int(os.environ.get("IDEMPOTENCY_TTL_HORAS", "24"))
+
+def indice(*campos, name: Optional[str] = None, **opcoes) -> dict:
+    """Declaração de um índice: campos como ("campo", 1) e opções do create_index"""
+    chaves = [(c, 1) if isinstance(c, str) else tuple(c) for c in campos]
+    return {
+        "keys": chaves,
+        "name": name or "_".join(f"{campo}_{direcao}" for campo, direcao in chaves),
+        "options": opcoes
+    }
+
+# 📇 REGISTRO: coleção -> índices esperados
+INDICES: Dict[str, List[dict]] = {
+    "usuarios": [
+        indice("id", unique=True),
+        indice("email", unique=True),
+        indice("status"),
+    ],
+    "alunos": [
+        indice("id", unique=True),
+        indice("cpf"),
+        indice("status"),  # Contadores do dashboard admin
+    ],
+    "turmas": [
+        indice("id", unique=True),
+        indice("alunos_ids"),  # Multikey: turmas de um aluno
+        indice("instrutor_id"),
+        indice("monitor_id"),
+        indice("unidade_id", "curso_id"),
+        indice("ativo"),
+    ],
+    "cursos": [
+        indice("id", unique=True),
+    ],
+    "unidades": [
+        indice("id", unique=True),
+    ],
+    "attendances": [
+        indice("turma_id", "data", name="unique_turma_data", unique=True),
+        indice("data"),
+    ],
+    "atestados": [
+        indice("id", unique=True),
+        indice("aluno_id"),
+    ],
+    "justifications": [
+        indice("id", unique=True),
+        indice("student_id"),
+    ],
+    "desistentes": [
+        indice("aluno_id"),  # Reativação: delete_many por aluno
+    ],
+    "arquivos_blobs": [
+        indice("sha256", unique=True),
+        indice("file_id", unique=True),
+    ],
+    # GridFS: mesmos índices que o driver cria; previews.files.filename = file_id de origem
+    "justifications.files": [
+        indice("filename", "uploadDate"),
+    ],
+    "justifications.chunks": [
+        indice("files_id", "n", unique=True),
+    ],
+    "previews.files": [
+        indice("filename", "uploadDate"),
+    ],
+    "previews.chunks": [
+        indice("files_id", "n", unique=True),
+    ],
+    "frequencia_alunos": [
+        indice("aluno_id", "turma_id", name="unique_aluno_turma", unique=True),
+        indice("turma_id"),
+        # aluno_id no fim: a ordenação do feed de risco (percentual, aluno_id) sai do índice
+        indice("turma_id", "risco", "percentual", "aluno_id"),
+        indice("unidade_id", "risco", "percentual", "aluno_id"),
+    ],
+    "transicoes_risco": [
+        indice("turma_id", ("created_at", -1)),
+        indice("unidade_id", ("created_at", -1)),
+        indice(("created_at", -1)),
+    ],
+    "frequencia_diaria": [
+        indice("turma_id", "data", name="unique_turma_data", unique=True),
+        indice("data"),
+    ],
+    "frequencia_buckets": [
+        indice("dimensao", "dimensao_id", "granularidade", "periodo", name="unique_bucket", unique=True),
+    ],
+    "idempotency_keys": [
+        indice("usuario_id", "rota", "chave", name="unique_idempotency_key", unique=True),
+        indice("created_at", name="ttl_idempotency_key", expireAfterSeconds=IDEMPOTENCY_TTL_HORAS * 3600),
+    ],
+    "calendario_aulas": [
+        indice("turma_id", "data", name="unique_turma_data", unique=True),
+        indice("data"),
+    ],
+    "feriados": [
+        indice("data_inicio"),
+    ],
+}
+
+# Opções comparadas entre o declarado e o existente
+OPCOES_COMPARADAS = ("unique", "expireAfterSeconds", "sparse")
+
+def _opcoes(especificacao: dict) -> dict:
+    return {op: especificacao[op] for op in OPCOES_COMPARADAS if especificacao.get(op)}
+
+async def reconciliar_indices(db, dry_run: bool = False, remover_extras: bool = False) -> dict:
+    """Compara o registro com os índices existentes e aplica as diferenças
+
+    - faltando: declarados e inexistentes (criados, exceto em dry_run)
+    - divergentes: mesmas chaves com opções diferentes (apenas reportados)
+    - extras: existentes e não declarados (removidos só com remover_extras)
+    - erros: falhas de criação/remoção (ex.: duplicatas impedindo um índice único)
+    """
+    relatorio = {"faltando": [], "criados": [], "divergentes": [], "extras": [], "removidos": [], "erros": []}
+
+    for colecao, declarados in INDICES.items():
+        existentes = {
+            idx["name"]: idx
+            async for idx in db[colecao].list_indexes()
+            if idx["name"] != "_id_"
+        }
+        por_chaves = {tuple(idx["key"].items()): nome for nome, idx in existentes.items()}
+        reconhecidos = set()
+
+        for declarado in declarados:
+            nome_existente = por_chaves.get(tuple(declarado["keys"]))
+            if nome_existente:
+                reconhecidos.add(nome_existente)
+                opcoes_existentes = _opcoes(existentes[nome_existente])
+                if opcoes_existentes != _opcoes(declarado["options"]):
+                    relatorio["divergentes"].append({
+                        "colecao": colecao,
+                        "indice": nome_existente,
+                        "esperado": _opcoes(declarado["options"]),
+                        "existente": opcoes_existentes
+                    })
+                continue
+
+            relatorio["faltando"].append(f"{colecao}.{declarado['name']}")
+            if dry_run:
+                continue
+            try:
+                await db[colecao].create_index(declarado["keys"], name=declarado["name"], **declarado["options"])
+                relatorio["criados"].append(f"{colecao}.{declarado['name']}")
+            except Exception as e:
+                relatorio["erros"].append(f"{colecao}.{declarado['name']}: {e}")
+
+        for nome in existentes:
+            if nome in reconhecidos:
+                continue
+            relatorio["extras"].append(f"{colecao}.{nome}")
+            if remover_extras and not dry_run:
+                try:
+                    await db[colecao].drop_index(nome)
+                    relatorio["removidos"].append(f"{colecao}.{nome}")
+                except Exception as e:
+                    relatorio["erros"].append(f"{colecao}.{nome}: {e}")
+
+    return relatorio
+
+def imprimir_relatorio(relatorio: dict, dry_run: bool = False):
+    rotulos = {
+        "faltando": "🔍 Faltando" + (" (seriam criados)" if dry_run else ""),
+        "criados": "✅ Criados",
+        "divergentes": "⚠️ Divergentes (opções diferentes)",
+        "extras": "📎 Extras (não declarados)",
+        "removidos": "🗑️ Removidos",
+        "erros": "❌ Erros"
+    }
+    for chave, rotulo in rotulos.items():
+        itens = relatorio.get(chave) or []
+        if not itens:
+            continue
+        print(f"{rotulo}: {len(itens)}")
+        for item in itens:
+            print(f"   - {item}")
+    if not any(relatorio.values()):
+        print("✅ Índices em dia com o registro")
+
+async def main(dry_run: bool = False, remover_extras: bool = False):
+    from server import client, db
+
+    try:
+        relatorio = await reconciliar_indices(db, dry_run=dry_run, remover_extras=remover_extras)
+        imprimir_relatorio(relatorio, dry_run=dry_run)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconciliação dos índices do MongoDB com o registro declarativo")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas reportar, sem criar ou remover")
+    parser.add_argument("--drop-extras", action="store_true", help="Remover índices não declarados")
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run, args.drop_extras))
@@ -0,0 +1,224 @@
+"""
+Métricas em processo no formato de exposição de texto do Prometheus
+
+Contadores, gauges e histogramas simples (dict por combinação de rótulos,
+um lock por métrica), baratos o bastante para ficarem sempre ligados.
+Cada worker expõe as próprias métricas; a agregação fica com o Prometheus.
+
+Fontes:
+- HTTP: observador do CORSInstrumentacaoMiddleware (rota = template do path)
+- MongoDB: CommandListener do pymongo (chamado nas threads do Motor)
+- Filas e caches: registrados pelo server.py (gauges calculados na coleta)
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_TAMANHO = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _rotulos(nomes: Sequence[str], valores: Sequence, extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+
+    def linhas(self) -> List[str]:
+        raise NotImplementedError
+
+    def exposicao(self) -> List[str]:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"] + self.linhas()
+
+class Contador(Metrica):
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        super().__init__(nome, ajuda, rotulos)
+        self._valores: Dict[tuple, float] = {}
+
+    def inc(self, *valores, n: float = 1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + n
+
+    def valor(self, *valores) -> float:
+        return self._valores.get(valores, 0)
+
+    def linhas(self) -> List[str]:
+        with self._lock:
+            itens = list(self._valores.items())
+        return [f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}" for chave, valor in itens]
+
+class Gauge(Metrica):
+    """Gauge com valor mantido (inc/dec/set) ou calculado na coleta (funcao)"""
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                 funcao: Optional[Callable[[], object]] = None):
+        super().__init__(nome, ajuda, rotulos)
+        self._valores: Dict[tuple, float] = {}
+        self.funcao = funcao
+
+    def inc(self, *valores, n: float = 1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + n
+
+    def dec(self, *valores, n: float = 1):
+        self.inc(*valores, n=-n)
+
+    def set(self, valor: float, *valores):
+        with self._lock:
+            self._valores[valores] = valor
+
+    def linhas(self) -> List[str]:
+        if self.funcao is not None:
+            resultado = self.funcao()
+            # Sem rótulos a função devolve um número; com rótulos, {tupla_de_rótulos: valor}
+            itens = list(resultado.items()) if isinstance(resultado, dict) else [((), resultado)]
+        else:
+            with self._lock:
+                itens = list(self._valores.items())
+        return [
+            f"{self.nome}{_rotulos(self.rotulos, chave if isinstance(chave, tuple) else (chave,))} {_numero(valor)}"
+            for chave, valor in itens
+        ]
+
+class Histograma(Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                 buckets: Iterable[float] = BUCKETS_LATENCIA):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}  # rótulos -> [contagens por bucket (+Inf no fim), soma]
+
+    def observe(self, valor: float, *valores):
+        indice = bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def linhas(self) -> List[str]:
+        with self._lock:
+            series = [(chave, list(contagens), soma) for chave, (contagens, soma) in self._series.items()]
+        linhas = []
+        for chave, contagens, soma in series:
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float("inf"),), contagens):
+                acumulado += contagem
+                le = f'le="{_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos, chave, le)} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {_numero(soma)}")
+            linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, chave)} {acumulado}")
+        return linhas
+
+class Registro:
+    def __init__(self):
+        self.metricas: List[Metrica] = []
+
+    def registrar(self, metrica: Metrica) -> Metrica:
+        self.metricas.append(metrica)
+        return metrica
+
+    def exposicao(self) -> str:
+        linhas = []
+        for metrica in self.metricas:
+            try:
+                linhas.extend(metrica.exposicao())
+            except Exception as e:
+                linhas.append(f"# ERRO {metrica.nome}: {_escapar(e)}")
+        return "\n".join(linhas) + "\n"
+
+REGISTRO = Registro()
+
+# -------------------------
+# HTTP
+# -------------------------
+HTTP_REQUISICOES = REGISTRO.registrar(Contador(
+    "ios_http_requests_total", "Requisições HTTP por rota e status", ("method", "route", "status")))
+HTTP_LATENCIA = REGISTRO.registrar(Histograma(
+    "ios_http_request_duration_seconds", "Latência das requisições HTTP", ("method", "route")))
+HTTP_TAMANHO = REGISTRO.registrar(Histograma(
+    "ios_http_response_size_bytes", "Tamanho do corpo das respostas HTTP", ("method", "route"), BUCKETS_TAMANHO))
+HTTP_EM_ANDAMENTO = REGISTRO.registrar(Gauge(
+    "ios_http_requests_in_flight", "Requisições HTTP em andamento"))
+
+def observar_requisicao(metodo: str, rota: str, status: int, duracao: float, tamanho: int):
+    """Observador para CORSInstrumentacaoMiddleware"""
+    HTTP_REQUISICOES.inc(metodo, rota, status)
+    HTTP_LATENCIA.observe(duracao, metodo, rota)
+    HTTP_TAMANHO.observe(tamanho, metodo, rota)
+
+# -------------------------
+# MongoDB
+# -------------------------
+MONGO_COMANDOS = REGISTRO.registrar(Contador(
+    "ios_mongo_commands_total", "Comandos MongoDB por coleção", ("collection", "command", "result")))
+MONGO_LATENCIA = REGISTRO.registrar(Histograma(
+    "ios_mongo_command_duration_seconds", "Latência dos comandos MongoDB por coleção", ("collection", "command")))
+
+class MongoComandosListener(monitoring.CommandListener):
+    """Conta e mede comandos por coleção (passar em event_listeners do client)"""
+
+    def __init__(self):
+        self._colecoes: Dict[Tuple[int, object], str] = {}
+
+    def started(self, event):
+        colecao = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            colecao = event.command.get("collection")
+        self._colecoes[(event.request_id, event.connection_id)] = colecao if isinstance(colecao, str) else "-"
+
+    def _finalizar(self, event, resultado: str):
+        colecao = self._colecoes.pop((event.request_id, event.connection_id), "-")
+        MONGO_COMANDOS.inc(colecao, event.command_name, resultado)
+        MONGO_LATENCIA.observe(event.duration_micros / 1_000_000, colecao, event.command_name)
+
+    def succeeded(self, event):
+        self._finalizar(event, "ok")
+
+    def failed(self, event):
+        self._finalizar(event, "erro")
+
+# -------------------------
+# Caches
+# -------------------------
+CACHE_REQUISICOES = REGISTRO.registrar(Contador(
+    "ios_cache_requests_total", "Consultas aos caches em processo", ("cache", "result")))
+
+def _razao_acertos() -> dict:
+    caches = {chave[0] for chave in list(CACHE_REQUISICOES._valores)}
+    razoes = {}
+    for cache in caches:
+        hits = CACHE_REQUISICOES.valor(cache, "hit")
+        total = sum(valor for chave, valor in list(CACHE_REQUISICOES._valores.items()) if chave[0] == cache)
+        razoes[(cache,)] = hits / total if total else 0.0
+    return razoes
+
+REGISTRO.registrar(Gauge(
+    "ios_cache_hit_ratio", "Fração de hits por cache desde o início do processo", ("cache",), funcao=_razao_acertos))
+
+def registrar_cache(cache: str, resultado: str):
+    CACHE_REQUISICOES.inc(cache, resultado)
@@ -0,0 +1,47 @@
+"""
+Renderização das pré-visualizações (thumbnails) de anexos
+
+Funções puras (bytes -> JPEG), sem acesso ao banco: o agendamento e o
+armazenamento no GridFS ficam no server.py. Imagens usam Pillow; PDFs têm
+a primeira página renderizada com pypdfium2 (ambos em requirements.txt).
+"""
+
+import os
+from io import BytesIO
+from typing import Optional
+
+PREVIEW_TAMANHO_MAX = int(os.environ.get("PREVIEW_TAMANHO_MAX", "320"))  # px, maior lado
+PREVIEW_TIPOS_IMAGEM = ("image/jpeg", "image/jpg", "image/png")
+
+def renderizador_disponivel(mime: str) -> bool:
+    try:
+        import PIL  # noqa: F401
+        if mime == "application/pdf":
+            import pypdfium2  # noqa: F401
+    except ImportError:
+        return False
+    return mime == "application/pdf" or mime in PREVIEW_TIPOS_IMAGEM
+
+def renderizar_preview(conteudo: bytes, mime: str) -> Optional[bytes]:
+    """Gera um JPEG pequeno a partir da imagem ou da 1ª página do PDF (roda em thread)"""
+    from PIL import Image
+
+    if mime == "application/pdf":
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(conteudo)
+        try:
+            if len(pdf) == 0:
+                return None
+            pagina = pdf[0]
+            escala = min(1.0, PREVIEW_TAMANHO_MAX * 2 / max(pagina.get_width(), pagina.get_height(), 1))
+            imagem = pagina.render(scale=escala).to_pil()
+        finally:
+            pdf.close()
+    else:
+        imagem = Image.open(BytesIO(conteudo))
+
+    imagem = imagem.convert("RGB")
+    imagem.thumbnail((PREVIEW_TAMANHO_MAX, PREVIEW_TAMANHO_MAX))
+    saida = BytesIO()
+    imagem.save(saida, format="JPEG", quality=70, optimize=True)
+    return saida.getvalue()
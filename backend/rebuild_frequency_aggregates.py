@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Rebuild/verificação dos agregados de frequência
+(coleções frequencia_alunos, frequencia_diaria e frequencia_buckets)
+
+Uso:
+    python rebuild_frequency_aggregates.py              # reconstrói tudo
+    python rebuild_frequency_aggregates.py --turma ID   # reconstrói uma turma
+    python rebuild_frequency_aggregates.py --check      # apenas verifica consistência
+"""
+
+import argparse
+import asyncio
+
+from server import (
+    client,
+    garantir_indices,
+    reconstruir_buckets_frequencia,
+    reconstruir_frequencia_agregada,
+    reconstruir_frequencia_diaria,
+    verificar_frequencia_agregada,
+)
+
+async def main(turma_id=None, check=False):
+    try:
+        await garantir_indices()
+
+        if check:
+            resultado = await verificar_frequencia_agregada(turma_id)
+            print(f"📊 Esperado: {resultado['total_esperado']} | Gravado: {resultado['total_gravado']}")
+            if resultado["consistente"]:
+                print("✅ Agregados consistentes com as chamadas")
+            else:
+                print(f"❌ {resultado['total_divergencias']} divergência(s):")
+                for div in resultado["divergencias"]:
+                    print(f"   - turma={div['turma_id']} aluno={div['aluno_id']}: {div['problema']}")
+            return
+
+        resultado = await reconstruir_frequencia_agregada(turma_id)
+        print(f"✅ {resultado['agregados']} agregados reconstruídos em {resultado['turmas']} turma(s)")
+
+        resultado = await reconstruir_frequencia_diaria(turma_id)
+        print(f"✅ {resultado['dias']} rollups diários reconstruídos em {resultado['turmas']} turma(s)")
+
+        # Buckets de curso/unidade somam várias turmas: sempre reconstruídos por completo
+        resultado = await reconstruir_buckets_frequencia()
+        print(f"✅ {resultado['buckets']} buckets de analytics reconstruídos")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild dos agregados de frequência")
+    parser.add_argument("--turma", dest="turma_id", default=None, help="Reconstruir apenas esta turma")
+    parser.add_argument("--check", action="store_true", help="Apenas verificar consistência")
+    args = parser.parse_args()
+    asyncio.run(main(args.turma_id, args.check))
@@ -0,0 +1,131 @@
+"""
+Logging estruturado e não-bloqueante
+
+- Os handlers reais (stdout) rodam numa thread de fundo (QueueListener);
+  no event loop o log só monta o LogRecord e o coloca numa fila
+- Cada linha leva o request_id da requisição atual (contextvar definida
+  pelo middleware ASGI)
+- Níveis por módulo via ambiente; DEBUG é amostrado por requisição, e a
+  formatação só acontece se o registro for emitido (use %s, não f-string)
+
+Variáveis de ambiente:
+    LOG_LEVEL             nível padrão (padrão: INFO)
+    LOG_LEVELS            níveis por logger, ex.: "server.alunos=DEBUG,pymongo=WARNING"
+    LOG_FORMAT            json | texto (padrão: json)
+    LOG_DEBUG_AMOSTRAGEM  fração das requisições com DEBUG emitido (padrão: 0.01)
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Tuple
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+debug_amostrado_var: ContextVar[bool] = ContextVar("debug_amostrado", default=True)
+
+DEBUG_AMOSTRAGEM = float(os.environ.get("LOG_DEBUG_AMOSTRAGEM", "0.01"))
+
+# Atributos padrão do LogRecord: o que sobrar veio de extra={} e vai para o JSON
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "request_id"}
+
+_listener: Optional[QueueListener] = None
+
+def novo_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def iniciar_contexto_requisicao(request_id: Optional[str] = None) -> Tuple[str, tuple]:
+    """Define request_id e a amostragem de DEBUG da requisição; devolve (id, tokens)"""
+    request_id = request_id or novo_request_id()
+    tokens = (
+        request_id_var.set(request_id),
+        debug_amostrado_var.set(random.random() < DEBUG_AMOSTRAGEM),
+    )
+    return request_id, tokens
+
+def encerrar_contexto_requisicao(tokens: tuple):
+    request_id_var.reset(tokens[0])
+    debug_amostrado_var.reset(tokens[1])
+
+class ContextoRequisicaoFilter(logging.Filter):
+    """Anexa o request_id e descarta DEBUG de requisições fora da amostra"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and not debug_amostrado_var.get():
+            return False
+        record.request_id = request_id_var.get()
+        return True
+
+class QueueHandlerLeve(QueueHandler):
+    """QueueHandler que só resolve a mensagem no event loop; a formatação fica na thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # O traceback precisa ser capturado aqui: a exceção não sobrevive até a thread
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        linha = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for chave, valor in record.__dict__.items():
+            if chave not in _ATRIBUTOS_PADRAO:
+                linha[chave] = valor
+        if record.exc_text:
+            linha["exc"] = record.exc_text
+        return json.dumps(linha, ensure_ascii=False, default=str)
+
+FORMATO_TEXTO = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+def _niveis_por_modulo(valor: str) -> dict:
+    niveis = {}
+    for item in filter(None, (parte.strip() for parte in valor.split(","))):
+        nome, _, nivel = item.partition("=")
+        if nivel:
+            niveis[nome.strip()] = nivel.strip().upper()
+    return niveis
+
+def configurar_logging() -> QueueListener:
+    """Instala QueueHandler no root e inicia a thread de escrita (idempotente)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    saida = logging.StreamHandler(sys.stdout)
+    if os.environ.get("LOG_FORMAT", "json").lower() == "json":
+        saida.setFormatter(JsonFormatter())
+    else:
+        saida.setFormatter(logging.Formatter(FORMATO_TEXTO))
+
+    fila: queue.SimpleQueue = queue.SimpleQueue()
+    handler = QueueHandlerLeve(fila)
+    handler.addFilter(ContextoRequisicaoFilter())
+
+    raiz = logging.getLogger()
+    for antigo in list(raiz.handlers):
+        raiz.removeHandler(antigo)
+    raiz.addHandler(handler)
+    raiz.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    for nome, nivel in _niveis_por_modulo(os.environ.get("LOG_LEVELS", "")).items():
+        logging.getLogger(nome).setLevel(nivel)
+
+    _listener = QueueListener(fila, saida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
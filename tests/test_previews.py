@@ -0,0 +1,48 @@
+"""
+Renderização das pré-visualizações de anexos (backend/previews.py)
+
+Gera imagens/PDFs em memória e confere que a miniatura sai como JPEG
+dentro do tamanho máximo. Não precisa de MongoDB.
+"""
+
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from previews import PREVIEW_TAMANHO_MAX, renderizador_disponivel, renderizar_preview  # noqa: E402
+
+def _imagem(formato: str, tamanho=(1200, 800)) -> bytes:
+    saida = BytesIO()
+    Image.new("RGB", tamanho, (200, 30, 30)).save(saida, format=formato)
+    return saida.getvalue()
+
+def _abrir_jpeg(conteudo: bytes):
+    miniatura = Image.open(BytesIO(conteudo))
+    assert miniatura.format == "JPEG"
+    return miniatura
+
+@pytest.mark.parametrize("mime,formato", [("image/png", "PNG"), ("image/jpeg", "JPEG")])
+def test_preview_de_imagem(mime, formato):
+    assert renderizador_disponivel(mime)
+    miniatura = _abrir_jpeg(renderizar_preview(_imagem(formato), mime))
+    assert max(miniatura.size) == PREVIEW_TAMANHO_MAX
+    assert miniatura.size[0] > miniatura.size[1]  # Proporção mantida
+
+def test_preview_de_imagem_pequena_nao_amplia():
+    miniatura = _abrir_jpeg(renderizar_preview(_imagem("PNG", (100, 50)), "image/png"))
+    assert miniatura.size == (100, 50)
+
+def test_preview_de_pdf():
+    pytest.importorskip("pypdfium2")
+    assert renderizador_disponivel("application/pdf")
+    miniatura = _abrir_jpeg(renderizar_preview(_imagem("PDF", (600, 900)), "application/pdf"))
+    assert max(miniatura.size) <= PREVIEW_TAMANHO_MAX
+    assert miniatura.size[1] > miniatura.size[0]
+
+def test_tipo_sem_renderizador():
+    assert not renderizador_disponivel("application/msword")
@@ -0,0 +1,482 @@
+"""
+Regressão de planos de consulta do MongoDB
+
+Popula um mongod local com dados sintéticos, aplica os índices do
+registro (backend/db_indexes.py) e roda explain() nas consultas dos
+caminhos quentes da API. Filtros e pipelines vêm dos mesmos construtores
+usados pelo server.py (backend/consultas.py). Falha se alguma consulta cair
+em COLLSCAN, examinar mais de N documentos por documento retornado (find)
+ou por documento que satisfaz o $match (aggregate), ou se um $sort seguido
+de $limit não for executado como top-k.
+
+A verificação estática (filtro coberto por um prefixo contínuo de um índice
+declarado e, quando há ordenação, ordem servida pelo índice) roda sempre;
+o restante exige mongod.
+
+Variáveis de ambiente:
+    QUERY_PLAN_MONGO_URL        mongod local (padrão: mongodb://localhost:27017)
+    QUERY_PLAN_MAX_RATIO        N: docs examinados / docs retornados (padrão: 3)
+    QUERY_PLAN_ARTIFACT         arquivo JSON com o resumo dos planos
+                                (padrão: query_plan_summary.json)
+    QUERY_PLAN_REQUIRE_MONGO    1: falha (em vez de skip) sem mongod acessível;
+                                ligado no job de CI (.github/workflows/query-plans.yml)
+
+Sem mongod acessível (e sem QUERY_PLAN_REQUIRE_MONGO), os testes com
+explain() são ignorados (skip).
+"""
+
+import json
+import os
+import random
+import sys
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from db_indexes import INDICES  # noqa: E402
+from consultas import (  # noqa: E402
+    ORDENACAO_ALUNOS_EM_RISCO,
+    estagios_pagina_frequencia,
+    filtro_periodo,
+    filtro_turmas_datas,
+    filtro_turmas_periodo,
+    pipeline_frequencia_agregados,
+    pipeline_frequencia_chamadas,
+    pipeline_soma_frequencia_diaria,
+    pipeline_tendencia_diaria,
+)
+
+MONGO_URL = os.environ.get("QUERY_PLAN_MONGO_URL", "mongodb://localhost:27017")
+MAX_RATIO = float(os.environ.get("QUERY_PLAN_MAX_RATIO", "3"))
+ARTIFACT = os.environ.get("QUERY_PLAN_ARTIFACT", "query_plan_summary.json")
+EXIGIR_MONGO = os.environ.get("QUERY_PLAN_REQUIRE_MONGO") == "1"
+
+N_UNIDADES = 5
+N_CURSOS = 10
+N_TURMAS = 200
+N_ALUNOS = 3000
+N_USUARIOS = 300
+N_DIAS = 30
+ALUNOS_POR_TURMA = 25
+
+# -------------------------
+# Fixtures: banco sintético
+# -------------------------
+
+@pytest.fixture(scope="session")
+def banco():
+    client = pymongo.MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except Exception as e:
+        if EXIGIR_MONGO:
+            pytest.fail(f"mongod obrigatório (QUERY_PLAN_REQUIRE_MONGO=1) indisponível em {MONGO_URL}: {e}")
+        pytest.skip(f"mongod local indisponível em {MONGO_URL}: {e}")
+
+    db = client[f"ios_query_plans_{uuid.uuid4().hex[:8]}"]
+    try:
+        for colecao, indices in INDICES.items():
+            for idx in indices:
+                db[colecao].create_index(idx["keys"], name=idx["name"], **idx["options"])
+        yield db
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+@pytest.fixture(scope="session")
+def dados(banco):
+    """Popula o banco e devolve ids representativos para as consultas"""
+    rnd = random.Random(42)
+    hoje = date.today()
+    dias = [(hoje - timedelta(days=i)).isoformat() for i in range(N_DIAS)]
+
+    unidades = [{"id": f"u{i}", "nome": f"Unidade {i}", "ativo": True} for i in range(N_UNIDADES)]
+    cursos = [{"id": f"c{i}", "nome": f"Curso {i}", "ativo": True} for i in range(N_CURSOS)]
+    usuarios = [
+        {
+            "id": f"usr{i}",
+            "email": f"usuario{i}@ios.org.br",
+            "tipo": "instrutor" if i % 3 else "pedagogo",
+            "status": "ativo",
+            "unidade_id": f"u{i % N_UNIDADES}",
+            "curso_id": f"c{i % N_CURSOS}",
+        }
+        for i in range(N_USUARIOS)
+    ]
+    alunos = [
+        {
+            "id": f"a{i}",
+            "nome": f"Aluno {i}",
+            "cpf": f"{i:011d}",
+            "ativo": True,
+            "status": "desistente" if i % 20 == 0 else "ativo",
+        }
+        for i in range(N_ALUNOS)
+    ]
+    turmas = []
+    for i in range(N_TURMAS):
+        turmas.append({
+            "id": f"t{i}",
+            "nome": f"Turma {i}",
+            "unidade_id": f"u{i % N_UNIDADES}",
+            "curso_id": f"c{i % N_CURSOS}",
+            "instrutor_id": f"usr{i % N_USUARIOS}",
+            "ativo": True,
+            "alunos_ids": [f"a{(i * ALUNOS_POR_TURMA + k) % N_ALUNOS}" for k in range(ALUNOS_POR_TURMA)],
+        })
+
+    attendances, diaria, calendario, frequencia = [], [], [], []
+    for turma in turmas:
+        for dia in dias:
+            bits = rnd.getrandbits(ALUNOS_POR_TURMA)
+            attendances.append({
+                "id": str(uuid.uuid4()),
+                "turma_id": turma["id"],
+                "data": dia,
+                "formato": "compacto",
+                "origem": "records",
+                "alunos_ids": turma["alunos_ids"],
+                "presenca_bits": [bits],
+                "notas": {},
+            })
+            presentes = bin(bits).count("1")
+            diaria.append({
+                "turma_id": turma["id"],
+                "data": dia,
+                "chamadas": 1,
+                "presentes": presentes,
+                "ausentes": ALUNOS_POR_TURMA - presentes,
+            })
+            calendario.append({"turma_id": turma["id"], "data": dia})
+        for aluno_id in turma["alunos_ids"]:
+            percentual = rnd.uniform(0, 100)
+            frequencia.append({
+                "aluno_id": aluno_id,
+                "turma_id": turma["id"],
+                "unidade_id": turma["unidade_id"],
+                "percentual": percentual,
+                "risco": "normal" if percentual >= 75 else "atencao" if percentual >= 50 else "critico",
+            })
+
+    atestados = [{"id": f"at{i}", "aluno_id": f"a{i % N_ALUNOS}"} for i in range(500)]
+    justifications = [{"id": f"j{i}", "student_id": f"a{(i * 7) % N_ALUNOS}"} for i in range(500)]
+    desistentes = [
+        {"id": f"d{i}", "aluno_id": aluno["id"], "turma_id": f"t{i % N_TURMAS}"}
+        for i, aluno in enumerate(alunos) if aluno["status"] == "desistente"
+    ]
+
+    for colecao, docs in (
+        ("unidades", unidades), ("cursos", cursos), ("usuarios", usuarios), ("alunos", alunos),
+        ("turmas", turmas), ("attendances", attendances), ("frequencia_diaria", diaria),
+        ("calendario_aulas", calendario), ("frequencia_alunos", frequencia),
+        ("atestados", atestados), ("justifications", justifications), ("desistentes", desistentes),
+    ):
+        banco[colecao].insert_many(docs)
+
+    instrutor_turmas = [t["id"] for t in turmas if t["instrutor_id"] == "usr1"]
+    return {
+        "email": "usuario17@ios.org.br",
+        "usuario_id": "usr17",
+        "instrutor_id": "usr1",
+        "turma": turmas[42],
+        "turma_ids": instrutor_turmas,
+        "aluno_id": "a123",
+        "desistente_id": "a120",
+        "cpf": f"{123:011d}",
+        "hoje": dias[0],
+        "dias": dias[:7],
+        "inicio": dias[-1],
+        "fim": dias[0],
+    }
+
+@pytest.fixture(scope="session")
+def resumo_planos():
+    resumo = {}
+    yield resumo
+    with open(ARTIFACT, "w", encoding="utf-8") as f:
+        json.dump({"max_ratio": MAX_RATIO, "consultas": resumo}, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 Resumo dos planos de consulta gravado em {ARTIFACT}")
+
+# -------------------------
+# Consultas dos caminhos quentes
+# -------------------------
+# Cada caso de find: (coleção, filtro, ordenação). Consultas com limit são
+# explicadas sem o limit: o que importa é o filtro estar coberto por índice.
+# Buscas por chave única ({"email": ...}, {"id": ...}) não têm construtor
+# próprio no server.py e ficam escritas aqui.
+
+CASOS = {
+    "login / get_current_user (usuarios.email)": lambda d: ("usuarios", {"email": d["email"]}, None),
+    "usuario por id": lambda d: ("usuarios", {"id": d["usuario_id"]}, None),
+    "turma por id": lambda d: ("turmas", {"id": d["turma"]["id"]}, None),
+    "turmas do instrutor": lambda d: ("turmas", {"instrutor_id": d["instrutor_id"]}, None),
+    "turmas de um aluno": lambda d: ("turmas", {"alunos_ids": d["aluno_id"]}, None),
+    "roster da turma": lambda d: (
+        "alunos",
+        {"id": {"$in": d["turma"]["alunos_ids"]}, "ativo": True, "status": {"$ne": "desistente"}},
+        None,
+    ),
+    "aluno por cpf": lambda d: ("alunos", {"cpf": d["cpf"]}, None),
+    "chamada da turma no dia": lambda d: ("attendances", {"turma_id": d["turma"]["id"], "data": d["hoje"]}, None),
+    "chamadas da turma": lambda d: ("attendances", {"turma_id": d["turma"]["id"]}, None),
+    "chamadas realizadas (pendências)": lambda d: (
+        "attendances", filtro_turmas_datas(d["turma_ids"], d["dias"]), None,
+    ),
+    "chamadas do dia (dashboard)": lambda d: ("attendances", {"data": d["hoje"]}, None),
+    "relatório de chamadas por período": lambda d: (
+        "attendances", {"turma_id": d["turma"]["id"], "data": filtro_periodo(d["inicio"], d["fim"])}, None,
+    ),
+    "agregados da turma": lambda d: ("frequencia_alunos", {"turma_id": d["turma"]["id"]}, None),
+    "alunos em risco": lambda d: (
+        "frequencia_alunos",
+        {"turma_id": {"$in": d["turma_ids"]}, "risco": {"$in": ["atencao", "critico"]}},
+        ORDENACAO_ALUNOS_EM_RISCO,
+    ),
+    "aulas previstas": lambda d: (
+        "calendario_aulas", filtro_turmas_periodo(d["turma_ids"], d["inicio"], d["fim"]), None,
+    ),
+    "atestados do aluno": lambda d: ("atestados", {"aluno_id": d["aluno_id"]}, None),
+    "justificativas do aluno": lambda d: ("justifications", {"student_id": d["aluno_id"]}, None),
+    "desistências do aluno (reativação)": lambda d: ("desistentes", {"aluno_id": d["desistente_id"]}, None),
+}
+
+def _pagina(ordenar_por: str, ordem: str) -> list:
+    """Estágios finais do relatório por aluno em JSON (mesmo $facet do endpoint)"""
+    return [{"$facet": {
+        "linhas": estagios_pagina_frequencia(ordenar_por, ordem, None, 50),
+        "total": [{"$count": "total"}],
+    }}]
+
+# Cada caso de aggregate: (coleção, pipeline). O primeiro estágio é sempre o
+# $match do endpoint; ele precisa ir para o índice.
+CASOS_AGREGACAO = {
+    "relatório por aluno (chamadas no período)": lambda d: (
+        "attendances",
+        pipeline_frequencia_chamadas(
+            {"turma_id": {"$in": d["turma_ids"]}, "data": filtro_periodo(d["inicio"], d["fim"])},
+            _pagina("nome", "asc"),
+        ),
+    ),
+    "relatório por aluno (agregados)": lambda d: (
+        "frequencia_alunos",
+        pipeline_frequencia_agregados({"turma_id": {"$in": d["turma_ids"]}}, _pagina("percentual", "desc")),
+    ),
+    "relatório por aluno (CSV, risco)": lambda d: (
+        "frequencia_alunos",
+        pipeline_frequencia_agregados(
+            {"turma_id": d["turma"]["id"]},
+            [{"$match": {"risco": {"$in": ["Atenção", "Situação Crítica"]}}}, {"$sort": {"total_faltas": -1, "aluno_id": 1}}],
+        ),
+    ),
+    "soma dos rollups diários": lambda d: (
+        "frequencia_diaria",
+        pipeline_soma_frequencia_diaria(filtro_turmas_periodo(d["turma_ids"], d["inicio"], d["fim"])),
+    ),
+    "tendência diária": lambda d: (
+        "frequencia_diaria",
+        pipeline_tendencia_diaria(filtro_turmas_periodo(d["turma_ids"], d["inicio"], d["fim"])),
+    ),
+}
+
+# Valores de exemplo para a verificação estática (mesmo formato de `dados`)
+DADOS_EXEMPLO = {
+    "email": "usuario@ios.org.br",
+    "usuario_id": "usr1",
+    "instrutor_id": "usr1",
+    "turma": {"id": "t1", "alunos_ids": ["a1", "a2"]},
+    "turma_ids": ["t1", "t2"],
+    "aluno_id": "a1",
+    "desistente_id": "a1",
+    "cpf": "00000000001",
+    "hoje": "2025-01-31",
+    "dias": ["2025-01-30", "2025-01-31"],
+    "inicio": "2025-01-01",
+    "fim": "2025-01-31",
+}
+
+def _consulta_do_caso(nome: str, dados: dict) -> tuple:
+    """(coleção, filtro, ordenação) de um caso de find ou do $match (+ $sort) inicial de um aggregate"""
+    if nome in CASOS:
+        return CASOS[nome](dados)
+    colecao, pipeline = CASOS_AGREGACAO[nome](dados)
+    assert "$match" in pipeline[0], f"{nome}: pipeline não começa com $match ({list(pipeline[0])})"
+    ordenacao = None
+    if len(pipeline) > 1 and "$sort" in pipeline[1]:
+        ordenacao = list(pipeline[1]["$sort"].items())
+    return colecao, pipeline[0]["$match"], ordenacao
+
+def _igualdade(valor) -> bool:
+    """Valor exato ou $in: intervalos pontuais, que preservam a ordem das chaves seguintes"""
+    return not isinstance(valor, dict) or set(valor) == {"$in"}
+
+def prefixo_coberto(filtro: dict, chaves: list) -> list:
+    """Chaves iniciais do índice restringidas pelo filtro (até a primeira ausente)"""
+    prefixo = []
+    for campo, _ in chaves:
+        if campo not in filtro:
+            break
+        prefixo.append(campo)
+    return prefixo
+
+def ordem_do_indice(filtro: dict, ordenacao: list, chaves: list) -> bool:
+    """O índice entrega a ordenação: igualdades do filtro seguidas das chaves de ordenação
+    (na mesma direção ou toda invertida)"""
+    n = len(chaves) - len(ordenacao)
+    if n < 0:
+        return False
+    prefixo, sufixo = chaves[:n], [tuple(c) for c in chaves[n:]]
+    ordem = [tuple(c) for c in ordenacao]
+    invertida = [(campo, -direcao) for campo, direcao in ordem]
+    return (
+        all(campo in filtro and _igualdade(filtro[campo]) for campo, _ in prefixo)
+        and sufixo in (ordem, invertida)
+    )
+
+@pytest.mark.parametrize("nome", list(CASOS) + list(CASOS_AGREGACAO))
+def test_filtro_tem_indice_declarado(nome):
+    """Filtro coberto por um prefixo contínuo de índice declarado; ordenação servida por índice"""
+    colecao, filtro, ordenacao = _consulta_do_caso(nome, DADOS_EXEMPLO)
+    indices = INDICES.get(colecao, [])
+    campos = {campo for campo in filtro if not campo.startswith("$")}
+
+    melhor = max(indices, key=lambda idx: len(prefixo_coberto(filtro, idx["keys"])), default=None)
+    prefixo = prefixo_coberto(filtro, melhor["keys"]) if melhor else []
+    assert prefixo, f"{nome}: nenhum índice de {colecao} começa por {sorted(campos)}"
+
+    # Campo do filtro que está no índice, mas depois de uma chave ausente: o índice não o usa
+    indexados = {campo for campo, _ in melhor["keys"]}
+    fora_do_prefixo = (campos & indexados) - set(prefixo)
+    assert not fora_do_prefixo, (
+        f"{nome}: {sorted(fora_do_prefixo)} fora do prefixo contínuo de {melhor['name']} ({prefixo})"
+    )
+
+    if ordenacao:
+        assert any(ordem_do_indice(filtro, ordenacao, idx["keys"]) for idx in indices), (
+            f"{nome}: nenhum índice de {colecao} entrega a ordenação {ordenacao} (SORT em memória)"
+        )
+
+def estagios_do_plano(plano) -> list:
+    """Nomes de todos os estágios de um winningPlan (clássico ou SBE)"""
+    estagios = []
+    if isinstance(plano, dict):
+        if "stage" in plano:
+            estagios.append(plano["stage"])
+        for chave in ("queryPlan", "inputStage", "outerStage", "innerStage"):
+            estagios.extend(estagios_do_plano(plano.get(chave)))
+        for filho in plano.get("inputStages", []) or []:
+            estagios.extend(estagios_do_plano(filho))
+    return estagios
+
+def indices_do_plano(plano) -> list:
+    nomes = []
+    if isinstance(plano, dict):
+        if "indexName" in plano:
+            nomes.append(plano["indexName"])
+        for valor in plano.values():
+            if isinstance(valor, (dict, list)):
+                nomes.extend(indices_do_plano(valor))
+    elif isinstance(plano, list):
+        for item in plano:
+            nomes.extend(indices_do_plano(item))
+    return nomes
+
+@pytest.mark.parametrize("nome", list(CASOS))
+def test_consulta_usa_indice(nome, banco, dados, resumo_planos):
+    colecao, filtro, ordenacao = CASOS[nome](dados)
+    cursor = banco[colecao].find(filtro)
+    if ordenacao:
+        cursor = cursor.sort(ordenacao)
+    explain = cursor.explain()
+
+    plano = explain["queryPlanner"]["winningPlan"]
+    stats = explain.get("executionStats", {})
+    estagios = estagios_do_plano(plano)
+    retornados = stats.get("nReturned", 0)
+    examinados = stats.get("totalDocsExamined", 0)
+
+    resumo_planos[nome] = {
+        "colecao": colecao,
+        "filtro": json.loads(json.dumps(filtro, default=str)),
+        "estagios": estagios,
+        "indices": sorted(set(indices_do_plano(plano))),
+        "docs_retornados": retornados,
+        "docs_examinados": examinados,
+        "chaves_examinadas": stats.get("totalKeysExamined", 0),
+        "tempo_ms": stats.get("executionTimeMillis", 0),
+    }
+
+    assert "COLLSCAN" not in estagios, f"{nome}: COLLSCAN em {colecao} ({estagios})"
+    assert examinados <= MAX_RATIO * max(retornados, 1), (
+        f"{nome}: {examinados} docs examinados para {retornados} retornados (limite {MAX_RATIO}x)"
+    )
+
+def estagios_sort(explain) -> list:
+    """Todos os estágios $sort de um explain de aggregate (inclusive dentro de $facet)"""
+    encontrados = []
+    if isinstance(explain, dict):
+        for chave, valor in explain.items():
+            if chave == "$sort" and isinstance(valor, dict):
+                encontrados.append(valor)
+            else:
+                encontrados.extend(estagios_sort(valor))
+    elif isinstance(explain, list):
+        for item in explain:
+            encontrados.extend(estagios_sort(item))
+    return encontrados
+
+def sorts_com_limit(pipeline) -> int:
+    """Quantos $sort do pipeline são seguidos de $limit (viram top-k no servidor)"""
+    total = 0
+    for atual, seguinte in zip(pipeline, pipeline[1:] + [{}]):
+        if "$sort" in atual and "$limit" in seguinte:
+            total += 1
+        if "$facet" in atual:
+            total += sum(sorts_com_limit(sub) for sub in atual["$facet"].values())
+    return total
+
+@pytest.mark.parametrize("nome", list(CASOS_AGREGACAO))
+def test_agregacao_usa_indice(nome, banco, dados, resumo_planos):
+    colecao, pipeline = CASOS_AGREGACAO[nome](dados)
+    match = pipeline[0]["$match"]
+    explain = banco.command(
+        "explain",
+        {"aggregate": colecao, "pipeline": pipeline, "cursor": {}},
+        verbosity="executionStats",
+    )
+
+    # O $match vai para a camada de consulta: estágio $cursor (clássico) ou
+    # queryPlanner no topo (pipeline empurrado inteiro para o SBE)
+    estagios_pipeline = explain.get("stages") or [{"$cursor": explain}]
+    cursor = estagios_pipeline[0].get("$cursor", {})
+    assert "queryPlanner" in cursor, f"{nome}: $match não foi empurrado para a consulta ({list(estagios_pipeline[0])})"
+    plano = cursor["queryPlanner"]["winningPlan"]
+    stats = cursor.get("executionStats", {})
+    estagios = estagios_do_plano(plano)
+    examinados = stats.get("totalDocsExamined", 0)
+    satisfazem = banco[colecao].count_documents(match)
+    sorts = estagios_sort(explain)
+
+    resumo_planos[nome] = {
+        "colecao": colecao,
+        "match": json.loads(json.dumps(match, default=str)),
+        "estagios": estagios,
+        "indices": sorted(set(indices_do_plano(plano))),
+        "docs_match": satisfazem,
+        "docs_examinados": examinados,
+        "chaves_examinadas": stats.get("totalKeysExamined", 0),
+        "sorts": json.loads(json.dumps(sorts, default=str)),
+        "tempo_ms": stats.get("executionTimeMillis", 0),
+    }
+
+    assert satisfazem > 0, f"{nome}: o $match não encontrou documentos no banco sintético"
+    assert "COLLSCAN" not in estagios, f"{nome}: COLLSCAN em {colecao} ({estagios})"
+    assert examinados <= MAX_RATIO * satisfazem, (
+        f"{nome}: {examinados} docs examinados para {satisfazem} que satisfazem o $match (limite {MAX_RATIO}x)"
+    )
+    top_k = [sort for sort in sorts if "limit" in sort]
+    assert len(top_k) >= sorts_com_limit(pipeline), f"{nome}: $sort + $limit sem top-k ({sorts})"